@@ -2,9 +2,15 @@
 Writing a biot-savart solver from scratch
 """
 import ast
+import os
 import sys
-from modules.parse_json import parse_json
-from modules.bs_wires import Wires
+
+# The modules import each other directly, so make them importable from here
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules"))
+from parse_json import parse_json  # noqa: E402
+from bs_wires import Wires, GeometryCache  # noqa: E402
+from bs_actions import do_action  # noqa: E402
+from bs_solver import set_field_cache, field_cache_stats  # noqa: E402
 
 
 def parse_args(args):
@@ -22,6 +28,39 @@ def parse_args(args):
     return args, kwargs
 
 
+def parse_flags(flags):
+    """
+    Parse optional `--flag value` (or `--flag=value`) pairs given after the JSON filepath into solver options.
+
+    Supported flags:
+        --workers: number of processes to share magnetic field calculations across
+        --geometry-cache: directory to cache built coil geometry in, to be reused by later runs
+        --field-cache: directory to cache solved magnetic fields in, to be reused within the run and by later runs
+    """
+    options = {}
+
+    i = 0
+    while i < len(flags):
+        flag, _, value = flags[i].partition("=")
+        if value == "":
+            i += 1
+            value = flags[i]
+
+        match flag:
+            case "--workers":
+                options["workers"] = int(value)
+            case "--geometry-cache":
+                options["geometry_cache"] = value
+            case "--field-cache":
+                options["field_cache"] = value
+            case _:
+                raise Exception(f"Flag {flag} not recognised. Supported flags are: --workers, --geometry-cache, "
+                                "--field-cache.")
+        i += 1
+
+    return options
+
+
 def main():
     """
     Testing how we extract `what to do` from the JSON file.
@@ -30,17 +69,36 @@ def main():
     args, _ = parse_args(sys.argv)
     json_path = args[0][1]
 
+    # Any further arguments are flags for the solver, e.g. `--workers 8`
+    options = parse_flags(args[0][2:])
+
     coils, actions = parse_json(json_path)
 
-    # Create a new object Wires; a list of all wires and coils which have been created
-    wires = Wires()
+    # Create a new object Wires; a list of all wires and coils which have been created, reusing cached geometry
+    # if asked to
+    geometry_cache = options.pop("geometry_cache", None)
+    wires = Wires(cache=None if geometry_cache is None else GeometryCache(geometry_cache))
     for coil in coils:
         wires.new_wire(coil)
     wires.print_wires_with_properties()
 
-    # Check if `plot coils` is given as an action. If so, do it
-    if any("plot coils" in action for action in actions):
-        wires.plot_wires()
+    # Reuse solved fields, within the run and across runs, if asked to
+    field_cache = options.pop("field_cache", None)
+    if field_cache is not None:
+        set_field_cache(field_cache)
+        options["cache"] = True
+
+    # Iterate through all actions and perform them
+    for action in actions:
+        do_action(action, wires, **options)
+
+    # Report how much work the caches saved
+    if field_cache is not None:
+        stats = field_cache_stats()
+        print(f"Field cache: {stats['hits']} hits, {stats['misses']} misses")
+        print(f"Field disk cache: {stats['disk_hits']} hits, {stats['disk_misses']} misses")
+    if wires.cache is not None:
+        print(f"Geometry cache: {wires.cache.hits} hits, {wires.cache.misses} misses")
 
 
 if __name__ == '__main__':
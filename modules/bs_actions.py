@@ -1,30 +1,40 @@
 """
 Library file to perform `actions` as requested.
 """
-from numpy import asarray, broadcast_arrays, linspace, array, meshgrid, sqrt, pi, floor, log10, zeros_like, zeros, unique
-from bs_solver import solve, b_abs
+from numpy import asarray, broadcast_arrays, meshgrid, sqrt, pi, floor, log10, zeros_like, zeros, arange, int64,\
+    concatenate, stack, median, array, linspace, setdiff1d, searchsorted, insert
+from bs_solver import solve, solve_to_file, load_field, b_abs
+from bs_points import Line, Plane, Box, AffinePointSet
 from scipy.constants import mu_0 as mu
 import matplotlib.pyplot as plt
-from itertools import product
-from scipy.interpolate import interp2d
 
 
 def _round_sig(x, sig=2):
     return round(x, sig-int(floor(log10(abs(x))))-1)
 
 
-def _validate_magnetic_field(action, wires):
+def _solver_options(action, options):
+    """
+    Combine the solver options given to `do_action` with any set in the action itself, which take precedence.
+    """
+    action_options = {key: action[key] for key in ["precision", "quadrature", "multipole", "symmetry"]
+                      if action.get(key) is not None}
+
+    return options | action_options
+
+
+def _validate_magnetic_field(action, wires, **options):
     """
     Validate magnetic field for given parameters.
+
+    Any `options` are passed on to the solver.
     """
-    # Set up the points (xs, ys, zs) at which the magnetic field will be calculated
-    xs = linspace(action["start_point"][0], action["end_point"][0], action["np"])
-    ys = linspace(action["start_point"][1], action["end_point"][1], action["np"])
-    zs = linspace(action["start_point"][2], action["end_point"][2], action["np"])
-    points = array([xs, ys, zs])
+    # Set up the line of points at which the magnetic field will be calculated
+    points = Line(action["start_point"], action["end_point"], action["np"])
+    zs = points.array()[2]
 
     # Calculate resultant magnetic field via bs_solver
-    b = solve(wires, points)
+    b = solve(wires, points, **_solver_options(action, options))
     b_mag = b_abs(b)
 
     # Validation assumes we're only working with one current loop. Compare to analytical solution:
@@ -89,37 +99,109 @@ def _ndmesh(*args):
     return broadcast_arrays(*[x[(slice(None),)+(None,)*i] for i, x in enumerate(args)])
 
 
-def _plot_slice_xy(action, wires):
+def _adaptive_slice_xy(wires, xlim, ylim, n, tolerance, levels, **options):
+    """
+    Calculate the magnitude of the magnetic field on the plane z = 0 by adaptive refinement, returning the x, y and
+    |B| of every point calculated as three (K,) arrays.
+
+    The slice starts as a grid of n x n points, whose cells are refined as a quadtree up to `levels` times. A cell
+    is split in four wherever |B| at its centre or at the midpoint of any of its edges differs from the linear
+    interpolation of its corners by more than `tolerance` of the median |B| on the starting grid. The median is the
+    field typical of the slice, which a few starting points close to a wire cannot inflate, so the field away from
+    the wires is resolved to about `tolerance` of its own size too. The points gather where the field or its
+    gradient changes quickly, such as near wires, and the points of each level are solved together.
+
+    Any `options` are passed on to the solver.
+    """
+    # Points lie on a lattice of m x m points as fine as the deepest level, and are calculated as they are needed.
+    # Only the points calculated are kept, as their index i*m + j on the lattice in order and their |B|, so memory
+    # grows with the points solved rather than with the lattice
+    size = 2**levels
+    m = (n - 1)*size + 1
+    solved = zeros(0, dtype=int64)
+    b_mag = zeros(0)
+    xs = linspace(xlim[0], xlim[1], m)
+    ys = linspace(ylim[0], ylim[1], m)
+
+    def calculate(i, j):
+        nonlocal solved, b_mag
+        index = i.astype(int64)*m + j
+        new = setdiff1d(index, solved)
+        if len(new) != 0:
+            i_new, j_new = new // m, new % m
+            b_new = b_abs(solve(wires, array([xs[j_new], ys[i_new], zeros(len(new))]), **options))
+            position = searchsorted(solved, new)
+            solved, b_mag = insert(solved, position, new), insert(b_mag, position, b_new)
+
+        return b_mag[searchsorted(solved, index)]
+
+    # Lower left corner of every cell, with rows of y and columns of x, and the cells' size on the lattice
+    i, j = (a.ravel() * size for a in meshgrid(arange(n - 1), arange(n - 1), indexing="ij"))
+    scale = None
+    while len(i) != 0:
+        half = size // 2
+        corners = calculate(stack((i, i, i + size, i + size)), stack((j, j + size, j, j + size)))
+        if half == 0:
+            break
+        if scale is None:
+            scale = median(corners)
+
+        # Compare the centre and the midpoint of each edge to the mean of the corners either side of it
+        midpoints = calculate(stack((i + half, i, i + half, i + size, i + half)),
+                              stack((j + half, j + half, j, j + half, j + size)))
+        interpolated = stack((corners.mean(axis=0), (corners[0] + corners[1])/2, (corners[0] + corners[2])/2,
+                              (corners[2] + corners[3])/2, (corners[1] + corners[3])/2))
+        refine = (abs(midpoints - interpolated) > tolerance*scale).any(axis=0)
+
+        # Split every refined cell into its four children
+        i, j = i[refine], j[refine]
+        i = concatenate((i, i, i + half, i + half))
+        j = concatenate((j, j + half, j, j + half))
+        size = half
+
+    return xs[solved % m], ys[solved // m], b_mag
+
+
+def _plot_slice_xy(action, wires, **options):
     """
     Plots a heatmap of an xy slice of data.
+
+    Any `options` are passed on to the solver.
     """
     # Plot graph of results
     plt.style.use("seaborn")
     fig, ax = plt.subplots(ncols=1, nrows=1)
 
-    # Set up the points (xs, ys, zs) at which the magnetic field will be calculated
-    xs = linspace(action["xlim"][0], action["xlim"][1], action["np"])
-    ys = linspace(action["ylim"][0], action["ylim"][1], action["np"])
+    if action.get("adaptive"):
+        # Refine the slice where the field changes quickly, and draw it over a triangulation of the points
+        x, y, b_mag = _adaptive_slice_xy(wires, action["xlim"], action["ylim"], action["np"], action["tolerance"],
+                                         action["levels"], **_solver_options(action, options))
+        im = plt.tripcolor(x, y, b_mag, cmap=plt.colormaps['inferno'], shading="gouraud")
+        fig.colorbar(im, ax=ax)
 
-    points = zeros([3, int(action["np"]**2)])
+        if action["axes_equal"]:
+            ax.axis("equal")
 
-    i = 0
-    for (x, y) in product(xs, ys):
-        points[0][i] = x
-        points[1][i] = y
-        points[2][i] = 0
-        i += 1
+        plt.show()
+        return
 
-    b = solve(wires, points)
-    b_mag = b_abs(b)
+    if action.get("field_file") is not None:
+        # Read the slice nearest `z` from a volume written by `calculate magnetic field`, through a memory map
+        xs, ys, b = _read_slice_xy(action["field_file"], action["z"])
+        b_mag = b_abs(b.reshape(-1, 3))
+    else:
+        # Set up the slice of points in the plane z = 0 at which the magnetic field will be calculated, with y
+        # along the rows and x along the columns
+        points = Plane(zeros(3), zeros(2), action["xlim"], action["ylim"], (action["np"], action["np"]))
+        xs, ys = points.us, points.vs
 
-    cmap = plt.colormaps['inferno']
+        b = solve(wires, points, **_solver_options(action, options))
+        b_mag = b_abs(b)
 
-    x_map = unique(points[0])
-    y_map = unique(points[1])
+    cmap = plt.colormaps['inferno']
 
-    xx, yy = meshgrid(x_map, y_map)
-    bb = b_mag.reshape(len(y_map), len(x_map))
+    xx, yy = meshgrid(xs, ys)
+    bb = b_mag.reshape(len(ys), len(xs))
     im = plt.pcolormesh(xx, yy, bb, cmap=cmap, shading="gouraud")
     fig.colorbar(im, ax=ax)
 
@@ -182,14 +264,52 @@ def _plot_slice_xy(action, wires):
     # ax.imshow(b_mag, cmap="hot", interpolation="nearest")
 
 
-def do_action(action, wires):
+def _calculate_magnetic_field(action, wires, **options):
+    """
+    Calculate the magnetic field throughout a box of points, writing it to the `.npy` file `output` as it goes
+    (see `solve_to_file`), so the volume need not fit in memory. Repeating an interrupted calculation resumes it.
+
+    The box is stored indexed (z, y, x), with x varying fastest, so that each x-y slice is contiguous in the file.
+
+    Any `options` are passed on to the solver, except `cache`: the file is itself the stored field.
+    """
+    box = Box(action["lower"], action["upper"], action["np"])
+    points = AffinePointSet(box.origin, box.steps[::-1], box.shape[::-1])
+    options = {key: value for key, value in _solver_options(action, options).items() if key != "cache"}
+
+    b = solve_to_file(wires, points, action["output"], **options)
+    print(f"Magnetic field at {len(points)} points written to {action['output']}, of shape {b.shape}")
+
+
+def _read_slice_xy(filename, z):
+    """
+    Read the x-y slice of a volume written by `calculate magnetic field` nearest to `z`, returning the xs and ys
+    of the slice and its (y, x, 3) field. The file is memory-mapped and the slice is contiguous in it, so only the
+    slice is read.
+    """
+    b, progress = load_field(filename)
+    (x0, y0, z0), steps = progress["origin"], progress["steps"]
+    nz, ny, nx = progress["shape"]
+    if steps[0][0] != 0 or steps[2][2] != 0:
+        raise Exception(f"The volume in {filename} is not indexed (z, y, x). Please calculate it again.")
+
+    k = int(abs(arange(nz) * steps[0][2] + z0 - z).argmin())
+
+    return x0 + arange(nx) * steps[2][0], y0 + arange(ny) * steps[1][1], b[k]
+
+
+def do_action(action, wires, **options):
     """
     Pattern match the action's name and perform a task accordingly.
+
+    Any `options` (e.g. `workers`) are passed on to the solver by actions which calculate magnetic fields.
     """
     match action["name"]:
         case "validate magnetic field":
-            _validate_magnetic_field(action, wires)
+            _validate_magnetic_field(action, wires, **options)
         case "plot coils":
             _plot_wires(action, wires)
         case "plot slice xy":
-            _plot_slice_xy(action, wires)
\ No newline at end of file
+            _plot_slice_xy(action, wires, **options)
+        case "calculate magnetic field":
+            _calculate_magnetic_field(action, wires, **options)
\ No newline at end of file
@@ -2,49 +2,55 @@
 Library file to discretize wire elements.
 """
 
-from numpy import array, floor, append, sqrt
+from numpy import asarray, sqrt, ceil, maximum, concatenate, cumsum, repeat, arange, einsum, broadcast_to
 
 
-def _magnitude(vec):
+def discretize_segments(starts, ends, dl):
     """
-    Returns the magnitude of a vector
-    """
-    return sqrt(vec.dot(vec))
+    Discretize many straight segments at once into chunks of length at most dl.
 
+    `starts` and `ends` are (S, 3) arrays of the segment end points, and `dl` is either one chunk length or an
+    (S,) array of chunk lengths; a length of `inf` leaves a segment whole. Each segment is split into
+    ceil(length/dl) chunks of equal length, so the chunks cover the full length of every segment.
 
-def discretize(wire, segment, dl):
+    Returns the (M, 3) start and end points of every chunk, and an (S + 1,) array of offsets such that the
+    chunks of segment i are [offsets[i]:offsets[i + 1]].
     """
-    Discretize the nth segment of wire of chunk length dl
-    """
-    # Segment vector calculation
-    ux = segment[0][1] - segment[0][0]
-    uy = segment[1][1] - segment[1][0]
-    uz = segment[2][1] - segment[2][0]
+    starts = asarray(starts, dtype=float)
+    ends = asarray(ends, dtype=float)
+    dl = broadcast_to(asarray(dl, dtype=float), (len(starts),))
 
-    u = array([ux, uy, uz])
+    # Segment vector and length calculation
+    u = ends - starts
+    segment_len = sqrt(einsum("ij,ij->i", u, u))
 
-    segment_len = _magnitude(u)
+    # Calculate how many chunks to make of each segment. Round off floating point noise first, so that a segment
+    # which is a whole number of `dl` long isn't given an extra sliver of a chunk
+    n = maximum(1, ceil((segment_len / dl).round(9))).astype(int)
+    offsets = concatenate(([0], cumsum(n)))
 
-    # If segment is shorter than dl, return it
-    if segment_len < dl:
-        return segment
+    # Segment each chunk belongs to, and its position along that segment as a fraction of the segment length
+    segment = repeat(arange(len(n)), n)
+    k = arange(offsets[-1]) - offsets[segment]
+    t_start = (k / n[segment])[:, None]
+    t_end = ((k + 1) / n[segment])[:, None]
 
-    # Calculate how many segments to make
-    length_ratio = segment_len / dl
-    n = floor(length_ratio)
+    # Interpolate between the end points, so the first and last chunks start and end exactly on them
+    chunk_starts = (1 - t_start) * starts[segment] + t_start * ends[segment]
+    chunk_ends = (1 - t_end) * starts[segment] + t_end * ends[segment]
 
-    d_seg_x = array([segment[0][0]])
-    d_seg_y = array([segment[1][0]])
-    d_seg_z = array([segment[2][0]])
+    return chunk_starts, chunk_ends, offsets
 
-    # Calculate the length of the vector v
-    v = dl*u / _magnitude(u)
 
-    for i in range(1, int(n) + 1):
-        d_seg_x = append(d_seg_x, d_seg_x[-1] + v[0])
-        d_seg_y = append(d_seg_y, d_seg_y[-1] + v[1])
-        d_seg_z = append(d_seg_z, d_seg_z[-1] + v[2])
+def discretize(wire, segment, dl):
+    """
+    Discretize the nth segment of wire of chunk length dl
+
+    `segment` holds the coordinates of its two end points as [[x1, x2], [y1, y2], [z1, z2]]. Returns the points
+    dividing it into equal chunks of length at most dl, in the same form.
+    """
+    segment = asarray(segment, dtype=float)
 
-    d_seg = array([d_seg_x, d_seg_y, d_seg_z])
+    chunk_starts, chunk_ends, _ = discretize_segments(segment[:, :1].T, segment[:, 1:].T, dl)
 
-    return d_seg
+    return concatenate((chunk_starts, chunk_ends[-1:])).T
@@ -0,0 +1,210 @@
+"""
+Library file for structured sets of points at which to calculate the magnetic field.
+"""
+
+from abc import ABC, abstractmethod
+from numpy import array, asarray, arange, column_stack, unravel_index, prod, cos, sin, pi, linspace, zeros, sqrt,\
+    minimum, maximum
+from bs_wires import rotation_matrices
+
+
+class PointSet(ABC):
+    """
+    Implements a structured set of points: a regular grid of parameters of `shape`, and a map from the grid to
+    cartesian coordinates.
+
+    Coordinates are generated only when asked for, a block of the flattened grid at a time, so a point set costs
+    no memory however many points it has. Points are ordered as the grid flattened in C order, so the (N, ...)
+    field solved at them can be reshaped to `shape` + (...).
+
+    Subclasses implement `_coordinates`, and `_key` to describe themselves. They may also replace `bounds` with one
+    which needn't generate the points.
+    """
+    def __init__(self, shape):
+        self.shape = tuple(int(n) for n in shape)
+
+    def __len__(self):
+        return int(prod(self.shape))
+
+    @abstractmethod
+    def _coordinates(self, index):
+        """
+        Return the (n, 3) coordinates of the points at an (n, d) array of grid indices.
+        """
+
+    @abstractmethod
+    def _key(self):
+        """
+        Return a tuple of the parameters which describe the point set.
+        """
+
+    def key(self):
+        """
+        Return a key identifying the points, without generating them.
+        """
+        return (type(self).__name__, self.shape) + tuple(asarray(p, dtype=float).tobytes() for p in self._key())
+
+    def bounds(self):
+        """
+        Return the (lower, upper) corners of the bounding box of the points, generating them a block at a time.
+        """
+        lower, upper = None, None
+        for points in self.chunks(2**16):
+            block_lower, block_upper = points.min(axis=1), points.max(axis=1)
+            lower = block_lower if lower is None else minimum(lower, block_lower)
+            upper = block_upper if upper is None else maximum(upper, block_upper)
+
+        return lower, upper
+
+    def block(self, start, stop):
+        """
+        Return the (n, 3) coordinates of the points [start:stop] of the flattened grid.
+        """
+        index = column_stack(unravel_index(arange(start, min(stop, len(self))), self.shape))
+
+        return self._coordinates(index)
+
+    def chunks(self, size):
+        """
+        Yield the points as 3 x n blocks of at most `size` points, e.g. for `solve_iter`.
+        """
+        for start in range(0, len(self), size):
+            yield self.block(start, start + size).T
+
+    def array(self):
+        """
+        Return every point as a 3 x N array, as taken by `solve`.
+        """
+        return self.block(0, len(self)).T
+
+
+class AffinePointSet(PointSet):
+    """
+    Implements a grid of points spaced by a fixed `step` vector along each of its axes from `origin`.
+    """
+    def __init__(self, origin, steps, shape):
+        super().__init__(shape)
+        self.origin = array(origin, dtype=float)
+        self.steps = array(steps, dtype=float).reshape(len(self.shape), 3)
+
+    def _coordinates(self, index):
+        return self.origin + index @ self.steps
+
+    def _key(self):
+        return (self.origin, self.steps)
+
+    def bounds(self):
+        # The box spans the grid from its origin along every axis, whichever way each step points
+        span = (array(self.shape)[:, None] - 1) * self.steps
+
+        return self.origin + minimum(span, 0).sum(axis=0), self.origin + maximum(span, 0).sum(axis=0)
+
+
+def _step(start, stop, n):
+    """
+    Return the spacing of `n` points evenly spaced from `start` to `stop`, as `linspace` would space them.
+    """
+    return (asarray(stop, dtype=float) - start) / max(n - 1, 1)
+
+
+class Line(AffinePointSet):
+    """
+    Implements `n` points evenly spaced along a straight line from `start` to `end` (x, y, z), inclusive.
+    """
+    def __init__(self, start, end, n):
+        start = array(start, dtype=float)
+        super().__init__(start, [_step(start, end, n)], (n,))
+
+    def distance(self):
+        """
+        Return the distance of each point along the line from `start`.
+        """
+        return arange(self.shape[0]) * sqrt(self.steps[0] @ self.steps[0])
+
+
+class Plane(AffinePointSet):
+    """
+    Implements a slice of points on a plane about `centre` (x, y, z), with normal `orientation` (theta, phi).
+
+    The plane is the x-y plane turned to its orientation as a loop would be (see `rotation_matrices`), so that a
+    plane of orientation (0, 0) is a slice parallel to the x-y plane. Its points are a grid of `n` (u, v) points
+    spanning `ulim` along the plane's own x axis and `vlim` along its own y axis, measured from the centre, with
+    v along the rows and u along the columns of the grid.
+    """
+    def __init__(self, centre, orientation, ulim, vlim, n):
+        n_u, n_v = n
+        r = rotation_matrices(array([orientation], dtype=float))[0]
+        self.us = linspace(ulim[0], ulim[1], n_u)
+        self.vs = linspace(vlim[0], vlim[1], n_v)
+
+        origin = array(centre, dtype=float) + ulim[0]*r[:, 0] + vlim[0]*r[:, 1]
+        steps = [_step(vlim[0], vlim[1], n_v) * r[:, 1], _step(ulim[0], ulim[1], n_u) * r[:, 0]]
+        super().__init__(origin, steps, (n_v, n_u))
+
+
+class Box(AffinePointSet):
+    """
+    Implements a 3D grid of `n` (x, y, z) points evenly spaced from the corner `lower` (x, y, z) to the opposite
+    corner `upper`, inclusive, indexed (x, y, z).
+    """
+    def __init__(self, lower, upper, n):
+        lower, upper = array(lower, dtype=float), array(upper, dtype=float)
+        steps = zeros((3, 3))
+        for axis in range(3):
+            steps[axis, axis] = _step(lower[axis], upper[axis], n[axis])
+
+        super().__init__(lower, steps, n)
+
+
+class SphericalShell(PointSet):
+    """
+    Implements a grid of points on a sphere of `radius` about `centre` (x, y, z), of `n` (phi, theta) points: the
+    inclination phi from 0 to pi inclusive along the rows, and the azimuth theta over [0, 2 pi) along the columns.
+    """
+    def __init__(self, centre, radius, n):
+        super().__init__(n)
+        self.centre = array(centre, dtype=float)
+        self.radius = float(radius)
+
+    def _coordinates(self, index):
+        phi = pi * index[:, 0] / max(self.shape[0] - 1, 1)
+        theta = 2*pi * index[:, 1] / self.shape[1]
+
+        return self.centre + self.radius * column_stack((cos(theta)*sin(phi), sin(theta)*sin(phi), cos(phi)))
+
+    def _key(self):
+        return (self.centre, self.radius)
+
+    def bounds(self):
+        return self.centre - self.radius, self.centre + self.radius
+
+
+class CylinderSurface(PointSet):
+    """
+    Implements a grid of points on the curved surface of a cylinder of `radius` and `length` about `centre`
+    (x, y, z), with its axis along `orientation` (theta, phi) as for a loop. Its `n` (z, angle) points run the
+    length of the cylinder inclusive along the rows, and around its axis over [0, 2 pi) along the columns.
+    """
+    def __init__(self, centre, orientation, radius, length, n):
+        super().__init__(n)
+        self.centre = array(centre, dtype=float)
+        self.orientation = array(orientation, dtype=float)
+        self.radius = float(radius)
+        self.length = float(length)
+
+    def _coordinates(self, index):
+        z = self.length * (index[:, 0] / max(self.shape[0] - 1, 1) - 0.5)
+        angle = 2*pi * index[:, 1] / self.shape[1]
+        r = rotation_matrices(self.orientation[None])[0]
+
+        return self.centre + column_stack((self.radius*cos(angle), self.radius*sin(angle), z)) @ r.T
+
+    def _key(self):
+        return (self.centre, self.orientation, self.radius, self.length)
+
+    def bounds(self):
+        # The box holding the circles at either end of the cylinder
+        axis = rotation_matrices(self.orientation[None])[0][:, 2]
+        half = self.length/2 * abs(axis) + self.radius * sqrt(maximum(1 - axis**2, 0))
+
+        return self.centre - half, self.centre + half
@@ -0,0 +1,134 @@
+"""
+Library file for lookup tables of the magnetic field, interpolated in place of solving the Biot-Savart law.
+"""
+
+from numpy import array, asarray, ascontiguousarray, zeros, arange, floor, clip, ones, linspace, unravel_index,\
+    column_stack, diagonal, sqrt, einsum, all as np_all
+from bs_solver import solve, solve_to_file
+from bs_points import Box
+
+# Number of points at which the error of a table is measured when it is built, and the number of points
+# interpolated at once
+SAMPLES = 1000
+_INTERPOLATION_BLOCK = 4096
+
+
+def _lagrange_weights(x, n):
+    """
+    Return the (N, n) weights of the Lagrange polynomial through the nodes 0, 1, ..., n - 1, at each of the (N,)
+    local coordinates `x`.
+    """
+    w = ones((len(x), n))
+    for k in range(n):
+        for m in range(n):
+            if m != k:
+                w[:, k] *= (x - m) / (k - m)
+
+    return w
+
+
+class FieldTable:
+    """
+    Implements a lookup table of the magnetic field of some wires on a regular 3D grid, interpolated at any point
+    in the grid as a drop-in alternative to `solve`.
+
+    The field is solved once at the `n` (x, y, z) points of the box from `lower` to `upper` (see `bs_points.Box`).
+    If a `filename` is given, the table is written to that `.npy` file and memory-mapped (see `solve_to_file`), so
+    a table built before is reused, and a large one need not fit in memory. Any `options` are passed on to the
+    solver.
+
+    Points are interpolated from the surrounding `order` + 1 grid points along each axis: 1 for trilinear or 3 for
+    tricubic (Lagrange) interpolation, one-sided at the edges of the grid. `error` is the largest norm, in tesla,
+    of the difference between the interpolated and solved field vectors at a sample of `samples` midpoints of the
+    edges of the grid's cells. It is an estimate: the error is far larger within a few grid spacings of a wire,
+    where the field changes fastest.
+
+    Fields are never cached (see `solve`): the table is itself the stored field, and the points it solves directly
+    are seldom repeated.
+    """
+    def __init__(self, wires, lower, upper, n, order=3, filename=None, samples=SAMPLES, **options):
+        options.pop("cache", None)
+        self.wires = wires
+        self.options = options
+        self.grid = Box(lower, upper, n)
+        self.lower = self.grid.origin
+        self.steps = diagonal(self.grid.steps)
+        self.order = order
+
+        if any(size <= order for size in self.grid.shape):
+            raise Exception(f"A table of order {order} needs more than {order} points along each axis. You "
+                            f"provided: {self.grid.shape}.")
+
+        if filename is None:
+            self.b = solve(wires, self.grid, **options).reshape(self.grid.shape + (3,))
+        else:
+            self.b = solve_to_file(wires, self.grid, filename, **options)
+
+        self.error = self._measure_error(samples)
+
+    def _measure_error(self, samples):
+        """
+        Return the largest norm of the difference between the interpolated and solved field at `samples` cells
+        spread evenly through the grid, each sampled halfway along one of its edges, taking the three axes in turn.
+
+        The field is harmonic, so at the centre of a cell the errors along each axis largely cancel, and the
+        centres would underestimate the error.
+        """
+        cells = tuple(size - 1 for size in self.grid.shape)
+        index = column_stack(unravel_index(linspace(0, cells[0]*cells[1]*cells[2] - 1, samples).astype(int), cells))
+        offsets = zeros((samples, 3))
+        offsets[arange(samples), arange(samples) % 3] = 0.5
+        points = self.lower + (index + offsets) * self.steps
+
+        db = self._interpolate(points) - solve(self.wires, points.T, **self.options)
+
+        return float(sqrt(einsum("ij,ij->i", db, db.conj()).real).max())
+
+    def _interpolate(self, points):
+        """
+        Interpolate the table at an (N, 3) array of points inside the grid.
+        """
+        n = self.order + 1
+        shape = array(self.grid.shape)
+
+        # Start of the stencil of n grid points about each point along each axis, and the point's coordinate
+        # relative to it
+        t = (points - self.lower) / self.steps
+        start = clip(floor(t).astype(int) - (n//2 - 1), 0, shape - n)
+        weights = [_lagrange_weights(t[:, axis] - start[:, axis], n) for axis in range(3)]
+
+        # Gather the n x n x n stencil of every point at once, and contract it with the weights along each axis
+        r = arange(n)
+        stencils = self.b[(start[:, 0, None, None, None] + r[:, None, None]),
+                          (start[:, 1, None, None, None] + r[:, None]),
+                          (start[:, 2, None, None, None] + r)]
+
+        return einsum("ni,nj,nk,nijkc->nc", *weights, stencils, optimize=True)
+
+    def contains(self, points):
+        """
+        Return whether each of an (N, 3) array of points lies inside the grid.
+        """
+        t = (points - self.lower) / self.steps
+
+        return np_all((t >= 0) & (t <= array(self.grid.shape) - 1), axis=1)
+
+    def solve(self, points):
+        """
+        Return the magnetic field at a 3 x N array of points (or a single point (x, y, z)) as an (N, 3) array, as
+        `solve` would. Points inside the grid are interpolated, and any outside it solved
+        directly.
+        """
+        points = ascontiguousarray(asarray(points, dtype=float).reshape(3, -1).T)
+        inside = self.contains(points)
+
+        b = zeros((len(points), 3), dtype=self.b.dtype)
+        index = arange(len(points))[inside]
+        for start in range(0, len(index), _INTERPOLATION_BLOCK):
+            block = index[start:start + _INTERPOLATION_BLOCK]
+            b[block] = self._interpolate(points[block])
+
+        if not inside.all():
+            b[~inside] = solve(self.wires, points[~inside].T, **self.options)
+
+        return b
@@ -2,10 +2,182 @@
 Library file for wire shapes for Biot-Savart solver.
 """
 
+import json
+import os
 import matplotlib.pyplot as plt
 import mpl_toolkits.mplot3d.axes3d as p3
-from numpy import sqrt, cos, sin, arccos, linspace, zeros, array,\
-    concatenate, append, cross, matmul, dot, pi, arccos, arctan2, zeros_like
+from itertools import count
+from hashlib import sha1
+from numpy import load, save, ndarray, generic
+from numpy import cos, sin, linspace, zeros, array, concatenate, pi, zeros_like, column_stack, ascontiguousarray,\
+    full, inf, diff, repeat, arange, arctan2, indices, tile
+from bs_discretizer import discretize_segments
+
+# Every change to any Wire is stamped with a new version from this counter, so compiled geometry can tell
+# whether the wires it was built from have changed
+_versions = count()
+
+# Default size cap of an on-disk cache, in bytes
+DISK_CACHE_BYTES = 256 * 2**20
+
+# Parameters which name or drive a wire without changing its shape, and so are left out of geometry cache keys
+_NON_GEOMETRIC = ("name", "current", "n")
+
+
+def rotation_matrices(orientations):
+    """
+    Return the rotation matrices which turn the normal of a loop in the x-y plane, (0, 0, 1), to each of a (K, 2)
+    array of orientations (theta, phi), as a (K, 3, 3) array.
+
+    Each is a rotation by phi about the y axis, followed by a rotation by theta about the z axis.
+    """
+    theta, phi = orientations[:, 0], orientations[:, 1]
+    c_t, s_t, c_p, s_p = cos(theta), sin(theta), cos(phi), sin(phi)
+
+    r = zeros((len(orientations), 3, 3))
+    r[:, 0] = column_stack((c_t*c_p, -s_t, c_t*s_p))
+    r[:, 1] = column_stack((s_t*c_p, c_t, s_t*s_p))
+    r[:, 2] = column_stack((-s_p, zeros_like(phi), c_p))
+
+    return r
+
+
+def array_layout(params):
+    """
+    Return the (K, 3) centres and (K, 2) orientations of the coils of an array of coils, as parsed by `parse_json`:
+        "ring": `count` coils evenly spaced around a circle of `radius` about `centre`, in the x-y plane
+        "grid": a grid of `count` (x, y, z) coils spaced by `spacing` (x, y, z), centred on `centre`
+        "helix": `count` coils on a helix of `radius` about the z axis through `centre`, `per_turn` to each turn,
+            rising by `pitch` each turn from `centre`
+
+    Coils are oriented by the array's "orientation" rule, relative to the angle of each coil about the z axis
+    through the centre: "radial", "tangential" or "axial", or one fixed orientation for every coil. If it has no
+    rule, every coil keeps the orientation of the template coil.
+    """
+    centre = array(params["centre"], dtype=float)
+
+    match params["shape"]:
+        case "ring":
+            angles = 2*pi * arange(params["count"]) / params["count"]
+            offsets = column_stack((cos(angles), sin(angles), zeros_like(angles))) * params["radius"]
+        case "helix":
+            turns = arange(params["count"]) / params["per_turn"]
+            angles = 2*pi * turns
+            offsets = column_stack((params["radius"]*cos(angles), params["radius"]*sin(angles), params["pitch"]*turns))
+        case "grid":
+            counts = array(params["count"])
+            index = indices(counts).reshape(3, -1).T
+            offsets = (index - (counts - 1)/2) * array(params["spacing"], dtype=float)
+            angles = arctan2(offsets[:, 1], offsets[:, 0])
+
+    # A fixed orientation is an array, so only compare the rule if it is given by name
+    rule = params["orientation"] if isinstance(params["orientation"], str) else None
+    match rule:
+        case "radial":
+            orientations = column_stack((angles, full(len(angles), pi/2)))
+        case "tangential":
+            orientations = column_stack((angles + pi/2, full(len(angles), pi/2)))
+        case "axial":
+            orientations = zeros((len(offsets), 2))
+        case None if params["orientation"] is None:
+            orientations = tile(params["coil"]["orientation"], (len(offsets), 1))
+        case None:
+            orientations = tile(params["orientation"], (len(offsets), 1))
+
+    return centre + offsets, orientations
+
+
+class DiskCache:
+    """
+    On-disk cache of arrays, keyed on strings, which persists between runs.
+
+    Each entry is stored as one `.npy` file in `directory`. Once the files take up more than `max_bytes`, the
+    least recently used are removed. `hits` and `misses` count the lookups made.
+    """
+    def __init__(self, directory, max_bytes=DISK_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def load(self, key):
+        """
+        Return the array cached under `key`, or None if there is none.
+        """
+        path = self._path(key)
+
+        try:
+            a = load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used
+        os.utime(path)
+        self.hits += 1
+
+        return a
+
+    def save(self, key, a):
+        """
+        Cache the array `a` under `key`, then remove the least recently used entries until the cache fits in
+        `max_bytes`.
+        """
+        # Write to a temporary file first, so that other runs sharing the cache never read a partial entry
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            save(file, a, allow_pickle=False)
+        os.replace(temporary, path)
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry_path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+
+class GeometryCache(DiskCache):
+    """
+    On-disk cache of the coordinates of built wires, so that runs which reuse the same coils skip building them.
+
+    Coordinates are keyed on a hash of the parameters they were built from, leaving out those which don't change
+    their shape (`_NON_GEOMETRIC`).
+    """
+    def key(self, *params):
+        """
+        Return the key of the geometry built from `params`, which may be dictionaries of wire parameters, as
+        parsed by `parse_json`, or arrays.
+        """
+        def geometric(value):
+            match value:
+                case dict():
+                    return {k: geometric(v) for k, v in value.items() if k not in _NON_GEOMETRIC}
+                case ndarray():
+                    return {"shape": value.shape, "values": value.astype(float).ravel().tolist()}
+                case generic():
+                    return value.item()
+                case list() | tuple():
+                    return [geometric(v) for v in value]
+                case _:
+                    return value
+
+        return sha1(json.dumps(geometric(params), sort_keys=True).encode()).hexdigest()
 
 
 class Wires:
@@ -13,10 +185,93 @@ class Wires:
     Implements a collection of Wire objects.
 
     Wires is the object visible to `main.py`, and is effectively a list of all wires/coils which have been created.
+
+    If given a GeometryCache `cache`, the coordinates of new wires are reused from it whenever the same coils have
+    been built before.
     """
     # Create an empty list by default
-    def __init__(self):
-        self.wires = []
+    def __init__(self, wires=None, cache=None):
+        self.wires = [] if wires is None else list(wires)
+        self.cache = cache
+
+        # Compiled segment tables, and the versions of the wires they were compiled from
+        self._tables = {}
+        self._tables_versions = None
+
+    def segment_table(self, kernel="midpoint", analytic_circles=False):
+        """
+        Return the current elements of every wire compiled into one contiguous structure-of-arrays table, a
+        dictionary of:
+            "start": (M, 3) start point of each element
+            "direction": (M, 3) vector from the start to the end of each element
+            "midpoint": (M, 3) midpoint of each element
+            "index": (M,) index of the wire each element belongs to; elements of a wire are consecutive
+            "current": (M,) effective current of each element
+
+        The `exact` and `adaptive` kernels integrate or refine each straight segment themselves, so no wire is
+        discretized and any polyline wire is included; the `midpoint` kernel discretizes square loops into chunks
+        of length `dl`.
+        Circular loops are left out if they are to be solved analytically.
+
+        Tables are cached, and compiled again only once a wire has been added, removed or changed.
+        """
+        versions = [wire._version for wire in self.wires]
+        if versions != self._tables_versions:
+            self._tables = {}
+            self._tables_versions = versions
+
+        key = (kernel, analytic_circles)
+        if key not in self._tables:
+            self._tables[key] = self._compile_segment_table(kernel, analytic_circles)
+
+        return self._tables[key]
+
+    def _compile_segment_table(self, kernel, analytic_circles):
+        """
+        Gather the current elements of every wire into the table returned by `segment_table`.
+
+        The straight segments of every wire are collected first and then discretized together in one pass.
+        """
+        starts = [zeros((0, 3))]
+        ends = [zeros((0, 3))]
+        dls = [zeros(0)]
+        index = [zeros(0, dtype=int)]
+        currents = [zeros(0, dtype=complex)]
+
+        for i, wire in enumerate(self.wires):
+            if analytic_circles and wire.shape == "circle":
+                continue
+
+            # Chunk length for the wire's segments, where an infinite length leaves them whole
+            match (kernel, wire.shape):
+                case ("exact" | "adaptive", _) if len(wire.coordinates) != 0:
+                    dl = inf
+                case ("midpoint", "circle"):
+                    dl = inf
+                case ("midpoint", "square"):
+                    dl = wire.dl
+                case _:
+                    continue
+
+            path = wire.current_path()
+            starts.append(path[:-1])
+            ends.append(path[1:])
+            dls.append(full(len(path) - 1, dl))
+            index.append(full(len(path) - 1, i))
+            currents.append(full(len(path) - 1, wire.effective_current()))
+
+        starts, ends, offsets = discretize_segments(concatenate(starts), concatenate(ends), concatenate(dls))
+        chunks = diff(offsets)
+
+        table = {
+            "start": starts,
+            "direction": ends - starts,
+            "midpoint": (ends + starts)/2,
+            "index": repeat(concatenate(index), chunks),
+            "current": repeat(concatenate(currents), chunks)
+        }
+
+        return table
 
     def plot_wires(self, xlim=None, ylim=None, zlim=None, axes_equal=False):
         """
@@ -47,27 +302,88 @@ class Wires:
         Print all the Wire objects (and their properties) in Wires.
         """
         for wire in self.wires:
-            properties = vars(wire)
-            for property in properties:
-                print(f"{property}: {properties[property]}")
+            for property in Wire.__slots__:
+                if not property.startswith("_"):
+                    print(f"{property}: {getattr(wire, property)}")
             print()  # newline as separator
 
     def new_wire(self, params):
         """
         Create a new Wire object and add to self.wires
         """
+        # Arrays of coils are placed all at once
+        if params["shape"] in ("ring", "grid", "helix"):
+            self.new_array(params)
+            return
+
         new_wire = Wire()
 
+        # Reuse the coordinates of the wire if it has been built before
+        if self.cache is not None:
+            key = self.cache.key(params)
+            coordinates = self.cache.load(key)
+        else:
+            coordinates = None
+
         # Pattern match against wire_params to check what shape of wire we're creating
         match params["shape"]:
             case "circle":
-                new_wire.circular_loop(params)
+                new_wire.circular_loop(params, coordinates)
             case "square":
-                new_wire.square_loop(params)
+                new_wire.square_loop(params, coordinates)
+
+        if self.cache is not None and coordinates is None:
+            self.cache.save(key, new_wire.coordinates)
 
         # Now the wire is created, append it to our Wires object
         self.wires.append(new_wire)
 
+    def new_array(self, params):
+        """
+        Create every coil of an array of coils (see `array_layout`) from its template coil, placing them all at
+        once with `place_wires`.
+        """
+        centres, orientations = array_layout(params)
+
+        self.place_wires(params["coil"], centres, orientations)
+
+    def place_wires(self, params, centres, orientations):
+        """
+        Create copies of one loop at many centres and orientations at once, and add them to self.wires.
+
+        `params` describe the loop as for `new_wire`, apart from its centre and orientation, which are taken from
+        the (K, 3) array `centres` and the (K, 2) array of (theta, phi) `orientations`. The loop is built once in
+        the x-y plane about the origin, and all K copies are rotated and translated together. Copy k is named
+        after the loop, followed by `_k`.
+        """
+        centres = array(centres, dtype=float).reshape(-1, 3)
+        orientations = array(orientations, dtype=float).reshape(-1, 2)
+
+        # Build the template loop without any orientation or translation
+        template = Wires(cache=self.cache)
+        template.new_wire(params | {"centre": zeros(3), "orientation": zeros(2)})
+        template = template.wires[0]
+
+        # Reuse the coordinates of every copy if they have been placed before, as one (K, 3, M) array
+        if self.cache is not None:
+            key = self.cache.key(params, centres, orientations)
+            coordinates = self.cache.load(key)
+        else:
+            coordinates = None
+
+        if coordinates is None:
+            coordinates = rotation_matrices(orientations) @ template.coordinates.T + centres[:, :, None]
+            if self.cache is not None:
+                self.cache.save(key, coordinates)
+
+        for k in range(len(centres)):
+            new_wire = template.copy()
+            new_wire.name = f"{params['name']}_{k}"
+            new_wire.centre = centres[k]
+            new_wire.orientation = orientations[k]
+            new_wire.coordinates = ascontiguousarray(coordinates[k].T)
+            self.wires.append(new_wire)
+
 
 class Wire:
     """
@@ -78,18 +394,43 @@ class Wire:
 
     Creating a loop of wire, for example, can then be done by calling the
     circular_loop() method.
+
+    The coordinates of a Wire are stored as a C-contiguous (M, 3) array of points (x, y, z).
     """
+    __slots__ = ("name", "shape", "current", "coordinates", "n", "np", "dl", "radius", "length", "centre",
+                 "orientation", "_version")
+
     # Create a `null wire` by default,
     def __init__(self):
         self.name = "Default Wire Element"
         self.shape = None
         self.current = complex(1, 0)
-        self.coordinates = []
+        self.coordinates = zeros((0, 3))
         self.n = 1
         self.np = None
         self.dl = None
         self.radius = None
         self.length = None
+        self.centre = None
+        self.orientation = None
+
+    def __setattr__(self, name, value):
+        """
+        Set an attribute, stamping the wire with a new version so that geometry compiled from it is rebuilt.
+        """
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_version", next(_versions))
+
+    def copy(self):
+        """
+        Return a copy of the wire, sharing its arrays, which are replaced rather than modified in place.
+        """
+        new_wire = Wire()
+        for property in Wire.__slots__:
+            if not property.startswith("_"):
+                setattr(new_wire, property, getattr(self, property))
+
+        return new_wire
 
     def set_name(self, name):
         """
@@ -109,50 +450,46 @@ class Wire:
         """
         self.n = int(n)
 
-    def _gen_r_matrix(self, phi):
+    def effective_current(self):
         """
-        Generates the rotation matrix for a given combination of theta and phi.
+        Return the `effective current` of the wire, which is the current in the wire where the real part is
+        multiplied by the number of turns, n
         """
-        # Set theta to 0
-        theta = 0
+        return complex(self.current.real * self.n, self.current.imag)
 
-        # Unit vector of an x-y plane
-        v = array([0, 0, 1])
+    def current_path(self):
+        """
+        Return the coordinates of the wire ordered in the direction the current flows.
+        """
+        # Circular loops are generated clockwise about their normal, so the current flows against the order of
+        # their coordinates
+        if self.shape == "circle":
+            return self.coordinates[::-1]
 
-        # Create a unit vector of magnitude 1 to rotate towards
-        r = 1
-        v_p = array([r*cos(theta)*sin(phi), r*sin(theta)*sin(phi), r*cos(phi)])
+        return self.coordinates
 
-        # Generate unit vector of axis of rotation, u
-        n = cross(v, v_p)
-        u = n/self._magnitude(n)
+    def segments(self, discretization=True):
+        """
+        Return the start and end points of every current element of the wire as two (M, 3) arrays.
 
-        # Calculate angle between the two vectors, alpha, and pre-calculate
-        # cos(alpha) and sin(alpha)
-        alpha = arccos(dot(v, v_p)/(self._magnitude(v) * self._magnitude(v_p)))
-        a_cos = cos(alpha)
-        a_sin = sin(alpha)
+        If `discretization` is True, each straight segment of the wire is chunked into elements of length `dl`.
+        """
+        path = self.current_path()
 
-        # Extract components of u
-        u_x = u[0]
-        u_y = u[1]
-        u_z = u[2]
+        if not discretization:
+            return path[:-1], path[1:]
 
-        # Generate rotation matrix, r, in cartesian coordinates
-        r = array([
-            [a_cos+u_x**2*(1-a_cos), u_x*u_y*(1-a_cos)-u_z*a_sin, u_x*u_z*(1-a_cos)+u_y*a_sin],
-            [u_y*u_x*(1-a_cos)+u_z*a_sin, a_cos+u_y**2*(1-a_cos), u_y*u_z*(1-a_cos)-u_x*a_sin],
-            [u_z*u_x*(1-a_cos)-u_y*a_sin, u_z*u_y*(1-a_cos)+u_x*a_sin, a_cos+u_z**2*(1-a_cos)]
-            ])
+        starts, ends, _ = discretize_segments(path[:-1], path[1:], self.dl)
 
-        return r
+        return starts, ends
 
-    def _magnitude(self, vec):
+    def normal(self):
         """
-        Returns the magnitude of a vector
+        Return the unit vector normal to the loop surface, in cartesian coordinates.
         """
-        return sqrt(vec.dot(vec))
+        theta, phi = self.orientation[0], self.orientation[1]
 
+        return self._spherical_to_cartesian(array([1, theta, phi]))
 
     def _spherical_to_cartesian(self, point):
         """
@@ -169,94 +506,19 @@ class Wire:
 
         return array([x, y, z])
 
-
-    def _cartesian_to_spherical(self, point):
-        """
-        Return the cartesian point in spherical coordinates, asssuming a right-handed coordinate system.
-        """
-        # Unpack point
-        x = point[0]
-        y = point[1]
-        z = point[2]
-
-        r = sqrt(x**2 + y**2 + z**2)
-        theta = arctan2(y, x)
-        phi = arccos(z/r)
-
-        return array([r, theta, phi])
-
-
-    def _reorient_theta_translate(self, theta, centre):
-        """
-        Reorients the current loop in theta and translates to new centre.
-        """
-        # Iterate through each point in `coordinates` (x, y, z)
-        for i in range(len(self.coordinates[0])):
-            # Get the point to be reoriented
-            point = array([self.coordinates[0][i], self.coordinates[1][i], self.coordinates[2][i]])
-
-            # Convert the point to spherical coordinates
-            point_spherical = self._cartesian_to_spherical(point)
-
-            # Add theta
-            point_spherical[1] += theta
-
-            # Convert back to cartesian coordinates
-            point = self._spherical_to_cartesian(point_spherical)
-
-            # Save the new reoriented point
-            self.coordinates[0][i] = point[0] + centre[0]  # x
-            self.coordinates[1][i] = point[1] + centre[1]  # y
-            self.coordinates[2][i] = point[2] + centre[2]  # z
-
-
-    def _reorient_phi(self, phi):
-        """
-        Reorients the current loop in phi.
-        """
-        # Failsafe: Code will get confused if we attempt to reorient by phi = 0. If we attempt to, return
-        if phi == 0:
-            return
-
-        # Generate rotation matrix
-        r = self._gen_r_matrix(phi)
-        
-        # Iterate through each point in `coordinates` (x, y, z)
-        for i in range(len(self.coordinates[0])):
-            # Get the point to be reoriented
-            point = array([self.coordinates[0][i], self.coordinates[1][i], self.coordinates[2][i]])
-
-            # Iterate through the r_matrix and reorient
-            point = matmul(r, point)
-
-            # Save the new reoriented point
-            self.coordinates[0][i] = point[0]  # x
-            self.coordinates[1][i] = point[1]  # y
-            self.coordinates[2][i] = point[2]  # z
-
-
-
     def _reorient_loop(self, orientation, centre):
         """
-        Reorients the current loop based upon the angles (theta, phi)
+        Reorients the current loop based upon the angles (theta, phi), and translates it to its centre.
         Works for both square and circular current loops.
 
-        Order of operation:
-            - generate r_matrix
-            - reorient in phi, generating rotation matrix
-            - convert to spherical coordinates, reorient in theta, and translate to new centre
-            - translate to new centre
+        The loop is tilted by phi about the y axis, turned by theta about the z axis and then translated, as one
+        rotation matrix and translation applied to all its coordinates at once (see `rotation_matrices`).
         """
-        # Unpack orientation angles theta and phi
-        theta, phi = orientation[0], orientation[1]
-
-        # Reorient in phi
-        self._reorient_phi(phi)
+        r = rotation_matrices(array([orientation], dtype=float))[0]
 
-        # Reorient in theta
-        self._reorient_theta_translate(theta, centre)
+        self.coordinates = ascontiguousarray(self.coordinates @ r.T + array(centre, dtype=float))
 
-    def circular_loop(self, params):
+    def circular_loop(self, params, coordinates=None):
         """
         Create a circular loop of wire with:
             centre of loop `centre` (x, y, z)
@@ -269,6 +531,8 @@ class Wire:
         surface in spherical coordinates. For example, a loop sitting in an x-y plane would
         be of orientation (theta, phi) = (0, 0), i.e. (0, 0, 1) in Cartesian coordinates.
         A loop in an x-z plane would have orientation (theta, phi) = (0, pi/2).
+
+        If `coordinates` are given, e.g. from a GeometryCache, they are used instead of generating the loop.
         """
 
         # Set name of loop
@@ -280,6 +544,10 @@ class Wire:
         # Set radius of loop
         self.radius = params["radius"]
 
+        # Set centre and orientation of loop
+        self.centre = array(params["centre"], dtype=float)
+        self.orientation = array(params["orientation"], dtype=float)
+
         # Set complex current in loop
         self.current = params["current"]
 
@@ -289,6 +557,10 @@ class Wire:
         # Set number of points current loop is defined by
         self.np = params["np"]
 
+        if coordinates is not None:
+            self.coordinates = ascontiguousarray(coordinates, dtype=float)
+            return
+
         # Generate a circular loop in the x-y plane centred on (0, 0, 0): to be rotated and translated later
         t = linspace(0, 2*pi, self.np)
 
@@ -296,12 +568,12 @@ class Wire:
         y = params["radius"] * cos(t)
         z = zeros(self.np)
 
-        self.coordinates = [x, y, z]
+        self.coordinates = ascontiguousarray(column_stack((x, y, z)))
 
         # Now reorient the wire according to `orientation`
         self._reorient_loop(params["orientation"], params["centre"])
 
-    def square_loop(self, params):
+    def square_loop(self, params, coordinates=None):
         """
         Create a square loop of wire with:
             centre of square loop `centre` (x, y, z)
@@ -313,6 +585,8 @@ class Wire:
         surface in spherical coordinates. For example, a loop sitting in an x-y plane would
         be of orientation (theta, phi) = (0, 0), i.e. (0, 0, 1) in Cartesian coordinates.
         A loop in an x-z plane would have orientation (theta, phi) = (0, pi/2).
+
+        If `coordinates` are given, e.g. from a GeometryCache, they are used instead of generating the loop.
         """
 
         # Set name of loop
@@ -324,6 +598,10 @@ class Wire:
         # Set side length of loop
         self.length = params["length"]
 
+        # Set centre and orientation of loop
+        self.centre = array(params["centre"], dtype=float)
+        self.orientation = array(params["orientation"], dtype=float)
+
         # Set complex current in loop
         self.current = params["current"]
 
@@ -333,6 +611,10 @@ class Wire:
         # Set the discretization length
         self.dl = params["dl"]
 
+        if coordinates is not None:
+            self.coordinates = ascontiguousarray(coordinates, dtype=float)
+            return
+
         # Generate un-rotated origin based on a centre of (0, 0, 0)
         origin = array([params["length"]/2, -params["length"]/2, 0])
 
@@ -358,7 +640,7 @@ class Wire:
                 origin = array([0, 0, 0])
                 add_origin = False
             case None if len(self.coordinates) != 0:
-                origin = array(self.coordinates)[:, -1]
+                origin = self.coordinates[-1]
                 add_origin = False
             case _:
                 add_origin = True
@@ -366,28 +648,14 @@ class Wire:
         # Create new wire element from the origin
         new_wire = self._create_wire(origin, theta, phi, length, add_origin)
 
-        if len(self.coordinates) == 0:
-            self.coordinates = new_wire
-            return
-
-        match origin:
-            case None:
-                x = append(self.coordinates[0], new_wire[0][1])
-                y = append(self.coordinates[1], new_wire[1][1])
-                z = append(self.coordinates[2], new_wire[2][1])
-            case _:
-                x = concatenate((self.coordinates[0], new_wire[0]), axis=0)
-                y = concatenate((self.coordinates[1], new_wire[1]), axis=0)
-                z = concatenate((self.coordinates[2], new_wire[2]), axis=0)
-
-        self.coordinates = [x, y, z]
+        self.coordinates = ascontiguousarray(concatenate((self.coordinates, new_wire), axis=0))
 
     def _create_wire(self, origin, theta, phi, length, add_origin):
         '''
         Create_Wire(self,origin,theta,phi,length)
         creates a single wire length long, starting from point
         origin, with inclination theta and Azimuth phi and
-        returns its coordinates in the form [x,y,z]
+        returns its coordinates as an array of points [[x,y,z], ...]
         '''
 
         # Computes the unit vector
@@ -403,23 +671,17 @@ class Wire:
         # Manually add the origin if it has been explicitly specified
         match add_origin:
             case True:
-                x = array([origin[0], vertex[0]])
-                y = array([origin[1], vertex[1]])
-                z = array([origin[2], vertex[2]])
+                return array([origin, vertex], dtype=float)
             case False:
-                x = array([vertex[0]])
-                y = array([vertex[1]])
-                z = array([vertex[2]])
-
-        return [x, y, z]
+                return array([vertex], dtype=float)
 
     def plotme(self, ax=None, axes_equal=False):
         '''Plots itself. Optional axis argument, otherwise new axes are created
         inactive until ShowPlots is called'''
 
-        X = self.coordinates[0]
-        Y = self.coordinates[1]
-        Z = self.coordinates[2]
+        X = self.coordinates[:, 0]
+        Y = self.coordinates[:, 1]
+        Z = self.coordinates[:, 2]
 
         ax.plot(X, Y, Z)
         ax.set_xlabel('X')
@@ -115,6 +115,64 @@ def _parse_circle(coil):
     return parsed_coil
 
 
+def _parse_array_orientation(array_coil):
+    """
+    Parse the orientation rule of an array of coils: "radial" (normals pointing away from the array's axis),
+    "tangential" (normals pointing around the axis) or "axial" (normals along the axis), or one fixed orientation
+    for every coil. If KeyError, return None, keeping the orientation of the template coil.
+    """
+    try:
+        orientation = array_coil["orientation"]
+    except KeyError:
+        return None
+
+    if not isinstance(orientation, str):
+        return _parse_orientation(orientation)
+
+    match orientation.lower():
+        case ("radial" | "tangential" | "axial"):
+            return orientation.lower()
+        case _:
+            raise Exception(f"Orientation rule {orientation} is malformed. Please supply \"radial\", \"tangential\", \"axial\" or a fixed orientation and try again.")  # noqa: E501
+
+
+def _parse_array(array_coil):
+    """
+    Parse an array of coils (a "ring", "grid" or "helix") and convert into pythonic data types.
+
+    The array's "coil" is a template coil, parsed as any other coil, which may leave out its name, centre and
+    orientation: copies of it are placed by the array.
+    """
+    template = {
+        "name": array_coil["name"],
+        "centre": {"x": "0", "y": "0", "z": "0"},
+        "orientation": {"theta": "0", "phi": "0"}
+    } | array_coil["coil"]
+
+    parsed_array = {
+        "name": array_coil["name"],
+        "shape": array_coil["shape"],
+        "coil": _parse_coils([template])[0],
+        "centre": _parse_xyz(array_coil["centre"]) if "centre" in array_coil else array([0, 0, 0]),
+        "orientation": _parse_array_orientation(array_coil)
+    }
+
+    match array_coil["shape"]:
+        case "ring":
+            parsed_array["count"] = eval(array_coil["count"])
+            parsed_array["radius"] = eval(array_coil["radius"])
+        case "grid":
+            parsed_array["count"] = _parse_xyz(array_coil["count"]).astype(int)
+            parsed_array["spacing"] = _parse_xyz(array_coil["spacing"])
+        case "helix":
+            parsed_array["count"] = eval(array_coil["count"])
+            parsed_array["radius"] = eval(array_coil["radius"])
+            parsed_array["pitch"] = eval(array_coil["pitch"])
+            parsed_array["per_turn"] = eval(array_coil["coils per turn"])
+
+    return parsed_array
+
+
 def _parse_coils(coils):
     """
     Iteratively parse all coils in JSON, converting into pythonic data types.
@@ -128,9 +186,11 @@ def _parse_coils(coils):
                 parsed_coil = _parse_square(coil)
             case "circle":
                 parsed_coil = _parse_circle(coil)
+            case ("ring" | "grid" | "helix"):
+                parsed_coil = _parse_array(coil)
             case _:
                 shape = coil["shape"]
-                raise Exception(f"ERROR: Code currently only supports circular and square current loops. You provided: \"{shape}\". Please specify either \"circle\" or \"square\".")  # noqa: E501
+                raise Exception(f"ERROR: Code currently only supports circular and square current loops, and rings, grids and helices of them. You provided: \"{shape}\". Please specify either \"circle\", \"square\", \"ring\", \"grid\" or \"helix\".")  # noqa: E501
 
         parsed_coils.append(parsed_coil)
 
@@ -182,6 +242,64 @@ def _parse_lim(action, action_name):
         return None
 
 
+def _parse_precision(action):
+    """
+    Parse the precision the solver should run in, either "single" or "double".
+    If KeyError, return None.
+    """
+    try:
+        precision = action["precision"].lower()
+    except KeyError:
+        return None
+
+    match precision:
+        case ("single" | "float32"):
+            return "single"
+        case ("double" | "float64"):
+            return "double"
+        case _:
+            raise Exception(f"Precision {precision} is malformed. Please supply either \"single\" or \"double\" and try again.")  # noqa: E501
+
+
+def _parse_quadrature(action):
+    """
+    Parse the quadrature rule the solver should integrate each discretized element with.
+    If KeyError, return None.
+    """
+    try:
+        return action["quadrature"].lower()
+    except KeyError:
+        return None
+
+
+def _parse_multipole(action):
+    """
+    Parse the order of the far field expansion the solver should use for each wire, either "dipole" or
+    "quadrupole". If KeyError, return None.
+    """
+    try:
+        multipole = action["multipole"].lower()
+    except KeyError:
+        return None
+
+    match multipole:
+        case ("dipole" | "quadrupole"):
+            return multipole
+        case _:
+            raise Exception(f"Multipole {multipole} is malformed. Please supply either \"dipole\" or \"quadrupole\" and try again.")  # noqa: E501
+
+
+def _parse_symmetry(action):
+    """
+    Parse whether the solver should solve identical circular loops from shared field tables.
+    If KeyError, return None.
+    """
+    try:
+        return _parse_boolean(action, "symmetry")
+    except KeyError:
+        return None
+
+
 def _parse_plot(action):
     """
     Parse `plot coils` action and convert to pythonic data types.
@@ -205,7 +323,16 @@ def _parse_slice_xy(action):
         "xlim": _parse_lim(action, "xlim"),
         "ylim": _parse_lim(action, "ylim"),
         "axes_equal": _parse_boolean(action, "axes equal"),
-        "np": eval(action["number of points"])
+        "np": eval(action.get("number of points", "None")),
+        "field_file": action.get("field file"),
+        "z": eval(action.get("z", "0")),
+        "adaptive": _parse_boolean(action, "adaptive"),
+        "tolerance": eval(action.get("tolerance", "0.01")),
+        "levels": eval(action.get("levels", "6")),
+        "precision": _parse_precision(action),
+        "quadrature": _parse_quadrature(action),
+        "multipole": _parse_multipole(action),
+        "symmetry": _parse_symmetry(action)
     }
 
     return parsed_action
@@ -221,7 +348,31 @@ def _parse_validation(action):
         "shape": action["shape"],
         "start_point": _parse_xyz(action["start point"]),
         "end_point": _parse_xyz(action["end point"]),
-        "np": eval(action["number of points"])
+        "np": eval(action["number of points"]),
+        "precision": _parse_precision(action),
+        "quadrature": _parse_quadrature(action),
+        "multipole": _parse_multipole(action),
+        "symmetry": _parse_symmetry(action)
+    }
+
+    return parsed_action
+
+
+def _parse_calculation(action):
+    """
+    Parse `calculate magnetic field` action and convert to pythonic data types.
+    """
+    parsed_action = {
+        "name": action["name"],
+        "execute": _parse_boolean(action, "execute"),
+        "output": action["output"],
+        "lower": _parse_xyz(action["lower"]),
+        "upper": _parse_xyz(action["upper"]),
+        "np": _parse_xyz(action["number of points"]).astype(int),
+        "precision": _parse_precision(action),
+        "quadrature": _parse_quadrature(action),
+        "multipole": _parse_multipole(action),
+        "symmetry": _parse_symmetry(action)
     }
 
     return parsed_action
@@ -246,6 +397,8 @@ def _parse_actions(actions):
                 parsed_action = _parse_plot(action)
             case "plot slice xy":
                 parsed_action = _parse_slice_xy(action)
+            case "calculate magnetic field":
+                parsed_action = _parse_calculation(action)
      
         parsed_actions.append(parsed_action)
 
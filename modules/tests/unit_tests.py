@@ -8,7 +8,8 @@ Currently only checks if my modules are importing correctly, but I may add more
 import unittest
 import sys
 from import_above import allow_above_imports
-from numpy import all
+from numpy import all, array, allclose, array_equal, pi, zeros, linspace, sqrt, full, cos, sin, concatenate
+from scipy.constants import mu_0 as mu
 
 
 class TestCalc(unittest.TestCase):
@@ -29,6 +30,672 @@ class TestCalc(unittest.TestCase):
 
         self.assertTrue(conditions_to_pass, "All modules loaded correctly")
 
+    def test_vectorized_solve(self):
+        # The batched kernel should agree with summing `_solve_segment` over every element and point
+        from bs_solver import solve, _solve_segment, _compile_currents
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = array([[0.1, -0.3, 0.5], [0.2, 0.4, -0.1], [0.3, 0.0, 1.0]])
+
+        table = wires.segment_table()
+        currents = _compile_currents(wires.wires)
+        expected = zeros((3, 3), dtype=complex)
+        for start, direction, i in zip(table["start"], table["direction"], table["index"]):
+            segment = array([start, start + direction]).T
+            for j in range(3):
+                expected[j] += _solve_segment(segment, points[:, j], currents[i])
+
+        self.assertTrue(allclose(solve(wires, points), expected, rtol=1e-12, atol=1e-20))
+
+    def test_tiled_solve(self):
+        # Tiling the work into small blocks should not change the result
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        points = array([[0.1, -0.3, 0.5, 2.0], [0.2, 0.4, -0.1, 0.0], [0.3, 0.0, 1.0, -1.0]])
+
+        self.assertTrue(allclose(solve(wires, points, max_bytes=1000), solve(wires, points), rtol=1e-12, atol=1e-20))
+
+    def test_exact_square(self):
+        # The exact kernel should reproduce the on-axis field of a square loop without any discretization
+        from bs_solver import solve, b_abs
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        zs = linspace(0.1, 10, 50)
+        points = array([zeros(50), zeros(50), zs])
+
+        length = 2
+        r = sqrt(zs**2 + (length/2)**2)
+        b_analytical = mu/(2*pi*r**2) * length**2/sqrt(zs**2 + length**2/2)
+
+        self.assertTrue(allclose(b_abs(solve(wires, points, kernel="exact")), b_analytical, rtol=1e-12, atol=0))
+
+    def test_adaptive_square(self):
+        # Adaptive refinement should meet its tolerance against the exact kernel, close to the wire as well as far
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        xs = linspace(-1.5, 1.5, 13)
+        points = array([xs, 0.3*xs, full(13, 0.05)])
+
+        b_exact = solve(wires, points, kernel="exact")
+        b_adaptive = solve(wires, points, kernel="adaptive", tolerance=1e-6)
+
+        self.assertTrue(allclose(b_adaptive, b_exact, rtol=1e-5, atol=1e-5*abs(b_exact).max()))
+
+        # Tiling the work into small blocks of points and segments should not change the result
+        b_tiled = solve(wires, points, kernel="adaptive", tolerance=1e-6, max_bytes=1000)
+        self.assertTrue(allclose(b_tiled, b_exact, rtol=1e-5, atol=1e-5*abs(b_exact).max()))
+
+    def test_quadrature(self):
+        # Higher order rules should reach the exact kernel's field with far fewer chunks than the midpoint rule
+        from bs_solver import solve, QUADRATURE_RULES
+        from bs_wires import Wires
+
+        params = _square_params()
+        params["dl"] = 1
+        wires = Wires()
+        wires.new_wire(params)
+        points = array([[0.1, -0.3, 0.5, 0.0], [0.2, 0.4, -0.1, 0.0], [0.3, 0.0, 1.0, 2.0]])
+
+        b_exact = solve(wires, points, kernel="exact")
+        error = {rule: abs(solve(wires, points, quadrature=rule) - b_exact).max() for rule in QUADRATURE_RULES}
+
+        self.assertLess(error["gauss8"], 1e-6 * abs(b_exact).max())
+        self.assertLess(error["gauss4"], error["gauss2"])
+        self.assertLess(error["gauss2"], error["midpoint"])
+        with self.assertRaises(Exception):
+            solve(wires, points, quadrature="trapezoid")
+
+    def test_multipole_far_field(self):
+        # Far from a ring of squares the expansions should replace their segments to within the tolerance
+        from bs_solver import solve, basis
+        from bs_wires import Wires
+
+        wires = Wires()
+        for i in range(6):
+            params = _square_params()
+            params["length"] = 0.2
+            params["centre"] = array([2*cos(i*pi/3), 2*sin(i*pi/3), 0])
+            wires.new_wire(params)
+        xs = linspace(-6, 6, 7)
+        points = array([xs, 0.5*xs, full(7, 0.4)])
+
+        b = solve(wires, points)
+        b_far = solve(wires, points, multipole="quadrupole", tolerance=1e-3)
+
+        self.assertFalse(array_equal(b_far, b))
+        self.assertTrue(allclose(b_far, b, rtol=0, atol=1e-3*abs(b).max()))
+        self.assertTrue(allclose(basis(wires, points, multipole="quadrupole", tolerance=1e-3).sum(axis=2), b_far))
+        with self.assertRaises(Exception):
+            solve(wires, points, multipole="octupole")
+
+    def test_treecode(self):
+        # The treecode should sum the same elements as the midpoint kernel, directly for theta = 0 and to within a
+        # small error from cell expansions otherwise
+        from bs_solver import solve, basis
+        from bs_wires import Wires
+
+        wires = Wires()
+        for i in range(8):
+            params = _circle_params()
+            params["centre"] = array([cos(i*pi/4), sin(i*pi/4), 0])
+            params["current"] = complex(1, i/8)
+            wires.new_wire(params)
+        xs = linspace(-2, 2, 200)
+        points = array([xs, sin(3*xs), 0.2*xs])
+
+        b = solve(wires, points)
+        peak = abs(b).max()
+
+        self.assertTrue(allclose(solve(wires, points, kernel="treecode", theta=0), b, rtol=0, atol=1e-12*peak))
+        self.assertTrue(allclose(solve(wires, points, kernel="treecode"), b, rtol=0, atol=1e-3*peak))
+        b_basis = basis(wires, points, kernel="treecode", theta=0)
+        self.assertTrue(allclose(b_basis, basis(wires, points), rtol=0, atol=1e-12*abs(b_basis).max()))
+
+    def test_place_wires(self):
+        # Placing copies of a loop in one batch should give the same wires as creating each one separately
+        from bs_wires import Wires
+
+        centres = array([[0, 0, 0], [1, -2, 0.5], [-0.3, 0.2, 4]])
+        orientations = array([[0, 0], [pi/3, pi/2], [-2, 2.5]])
+
+        for params in (_square_params(), _circle_params()):
+            placed = Wires()
+            placed.place_wires(params, centres, orientations)
+            created = Wires()
+            for centre, orientation in zip(centres, orientations):
+                created.new_wire(params | {"centre": centre, "orientation": orientation})
+
+            for placed_wire, created_wire in zip(placed.wires, created.wires):
+                self.assertTrue(allclose(placed_wire.coordinates, created_wire.coordinates, rtol=0, atol=1e-14))
+                self.assertTrue(array_equal(placed_wire.centre, created_wire.centre))
+                self.assertEqual(placed_wire.current, created_wire.current)
+
+                # The loop should lie in the plane normal to its orientation
+                self.assertTrue(allclose((placed_wire.coordinates - placed_wire.centre) @ placed_wire.normal(), 0,
+                                         atol=1e-14))
+
+    def test_geometry_cache(self):
+        # Coils rebuilt from the geometry cache should match coils built from scratch, and the cache should stay
+        # within its size cap
+        from os import listdir
+        from os.path import getsize, join
+        from tempfile import TemporaryDirectory
+        from bs_wires import Wires, GeometryCache
+
+        centres = array([[0, 0, 0], [1, -2, 0.5], [-0.3, 0.2, 4]])
+        orientations = array([[0, 0], [pi/3, pi/2], [-2, 2.5]])
+
+        with TemporaryDirectory() as directory:
+            built = Wires(cache=GeometryCache(directory))
+            for params in (_square_params(), _circle_params()):
+                built.new_wire(params)
+            built.place_wires(_circle_params(), centres, orientations)
+
+            # The name and current of a coil don't change its shape, so a renamed coil is still a hit
+            cache = GeometryCache(directory)
+            cached = Wires(cache=cache)
+            for params in (_square_params(), _circle_params() | {"name": "renamed", "current": complex(3, 0)}):
+                cached.new_wire(params)
+            cached.place_wires(_circle_params(), centres, orientations)
+
+            self.assertEqual((cache.hits, cache.misses), (4, 0))
+            self.assertEqual(cached.wires[1].name, "renamed")
+            for built_wire, cached_wire in zip(built.wires, cached.wires):
+                self.assertTrue(array_equal(built_wire.coordinates, cached_wire.coordinates))
+
+            # A different coil is a miss, and evicts older entries once the cap is reached
+            cache.max_bytes = 5000
+            cached.new_wire(_circle_params() | {"radius": 0.5})
+            self.assertEqual(cache.misses, 1)
+            entries = listdir(directory)
+            self.assertLessEqual(sum(getsize(join(directory, entry)) for entry in entries), 5000)
+            self.assertLess(len(entries), 5)
+
+    def test_coil_arrays(self):
+        # A ring of coils should build the same wires as the hand-written ring of 8 coils, and grids and helices
+        # should place every coil
+        from os.path import dirname, join
+        from parse_json import parse_json, _parse_coils
+        from bs_wires import Wires
+
+        params = join(dirname(__file__), "validation_tests", "params")
+        ring = Wires()
+        for coil in parse_json(join(params, "plot_8_circles_ring.json"))[0]:
+            ring.new_wire(coil)
+        circles = Wires()
+        for coil in parse_json(join(params, "plot_8_circles.json"))[0]:
+            circles.new_wire(coil)
+
+        self.assertEqual(len(ring.wires), 8)
+        for ring_wire, circle_wire in zip(ring.wires, circles.wires):
+            self.assertTrue(allclose(ring_wire.coordinates, circle_wire.coordinates, rtol=0, atol=1e-14))
+
+        coil = {"shape": "square", "side length": "0.2", "discretization length": "0.05", "number of loops": "1",
+                "current": {"modulus": "1", "phase": "0"}}
+        arrays = _parse_coils([
+            {"name": "grid", "shape": "grid", "count": {"x": "2", "y": "3", "z": "1"},
+             "spacing": {"x": "1", "y": "0.5", "z": "1"}, "coil": coil},
+            {"name": "helix", "shape": "helix", "count": "5", "radius": "2", "pitch": "1", "coils per turn": "4",
+             "orientation": "axial", "coil": coil}
+        ])
+        wires = Wires()
+        for array_coil in arrays:
+            wires.new_wire(array_coil)
+
+        self.assertEqual(len(wires.wires), 11)
+        self.assertTrue(allclose(wires.wires[0].centre, [-0.5, -0.5, 0]))
+        self.assertTrue(allclose(wires.wires[6].centre, [2, 0, 0]))
+        self.assertTrue(allclose(wires.wires[10].centre, [2, 0, 1]))
+
+    def test_analytic_circles(self):
+        # The elliptic-integral solution should agree with a finely sampled loop, off the loop's axis
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        params = _circle_params()
+        params["np"] = 20000
+        wires = Wires()
+        wires.new_wire(params)
+        points = array([[0.1, -0.3, 0.5, 0.5], [0.2, 0.4, -0.1, 0.0], [0.3, 0.0, 1.0, 0.0]])
+
+        b_analytic = solve(wires, points, analytic_circles=True)
+        self.assertTrue(allclose(b_analytic, solve(wires, points), rtol=1e-6, atol=1e-12))
+
+    def test_symmetry(self):
+        # A ring of identical loops solved from one shared field table should match solving every loop in full,
+        # both away from and close to the loops
+        from bs_solver import solve, solve_iter, basis
+        from bs_wires import Wires
+
+        params = _circle_params()
+        params["np"] = 50
+        wires = Wires()
+        angles = linspace(0, 2*pi, 6, endpoint=False)
+        wires.place_wires(params, array([cos(angles), sin(angles), full(6, 0.0)]).T,
+                          array([angles, full(6, pi/2)]).T)
+        points = array([linspace(-2, 2, 41), linspace(-1, 1.5, 41), linspace(-0.2, 0.3, 41)])
+
+        b = solve(wires, points)
+        self.assertTrue(allclose(solve(wires, points, symmetry=True), b, rtol=1e-5, atol=1e-5*abs(b).max()))
+
+        # Streamed blocks should extend the tables built for the first block to reach the later ones
+        chunks = (points[:, i:i + 10] for i in range(0, 41, 10))
+        b_iter = concatenate(list(solve_iter(wires, chunks, symmetry=True)))
+        self.assertTrue(allclose(b_iter, b, rtol=1e-5, atol=1e-5*abs(b).max()))
+
+        b = basis(wires, points)
+        self.assertTrue(allclose(basis(wires, points, symmetry=True), b, rtol=1e-5, atol=1e-5*abs(b).max()))
+
+    def test_parallel_solve(self):
+        # Sharing the points across processes should give exactly the serial result
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = array([linspace(-1, 1, 37), linspace(0, 2, 37), linspace(-0.5, 0.5, 37)])
+
+        self.assertTrue(array_equal(solve(wires, points, workers=2), solve(wires, points)))
+
+    def test_parallel_solve_error(self):
+        # An error in a worker should reach the caller with the pool shut down and no shared memory left behind
+        from multiprocessing import active_children
+        from multiprocessing.shared_memory import SharedMemory
+        import bs_solver
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        points = array([linspace(-1, 1, 37), linspace(0, 2, 37), linspace(-0.5, 0.5, 37)]).T
+
+        # Record the name of every block of shared memory the solve creates
+        names = []
+        share = bs_solver._share
+
+        def recording_share(a, blocks):
+            description = share(a, blocks)
+            names.append(description[0])
+            return description
+
+        # A treecode geometry without any trees can only fail once a worker evaluates it
+        geometry = dict(bs_solver._compile(wires, "midpoint", False), kernel="treecode", trees=None)
+        try:
+            bs_solver._share = recording_share
+            with self.assertRaises(TypeError):
+                bs_solver._solve_parallel(geometry, points, bs_solver.MAX_BYTES, 2)
+        finally:
+            bs_solver._share = share
+
+        self.assertNotEqual(names, [])
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                SharedMemory(name=name)
+        self.assertEqual(active_children(), [])
+
+    def test_solve_iter(self):
+        # Streaming blocks of points should give the same fields as solving them all at once, with or without
+        # fetching the next block in the background
+        import bs_solver
+        from bs_solver import solve, solve_iter
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = array([linspace(-1, 1, 37), linspace(0, 2, 37), linspace(-0.5, 0.5, 37)])
+        b = solve(wires, points, cache=False)
+
+        for prefetch in (True, False):
+            chunks = (points[:, i:i + 10] for i in range(0, 37, 10))
+            blocks = list(solve_iter(wires, chunks, prefetch=prefetch))
+            self.assertEqual([len(block) for block in blocks], [10, 10, 10, 7])
+            self.assertTrue(allclose(concatenate(blocks), b, rtol=1e-12, atol=0))
+
+        # With workers, one pool should solve the whole stream, exactly as the serial path does
+        pools = []
+        executor = bs_solver.ProcessPoolExecutor
+
+        def recording_executor(*args, **kwargs):
+            pools.append(executor(*args, **kwargs))
+            return pools[-1]
+
+        try:
+            bs_solver.ProcessPoolExecutor = recording_executor
+            chunks = (points[:, i:i + 10] for i in range(0, 37, 10))
+            self.assertTrue(array_equal(concatenate(list(solve_iter(wires, chunks, workers=2))), b))
+        finally:
+            bs_solver.ProcessPoolExecutor = executor
+        self.assertEqual(len(pools), 1)
+
+    def test_point_sets(self):
+        # Point sets should generate the grids they describe, and solving one block at a time should match solving
+        # its materialized points
+        import bs_solver
+        from numpy import meshgrid, stack
+        from numpy.linalg import norm
+        from bs_points import Line, Plane, Box, SphericalShell, CylinderSurface
+        from bs_wires import Wires
+
+        line = Line([0, 1, -1], [2, 1, 3], 5)
+        self.assertTrue(allclose(line.array(), [linspace(0, 2, 5), full(5, 1), linspace(-1, 3, 5)]))
+
+        xs, ys = linspace(-1, 1, 4), linspace(0, 3, 6)
+        plane = Plane([0, 0, 0.5], [0, 0], [-1, 1], [0, 3], (4, 6))
+        self.assertEqual(plane.shape, (6, 4))
+        xx, yy = meshgrid(xs, ys)
+        self.assertTrue(allclose(plane.array().T.reshape(6, 4, 3), stack((xx, yy, full((6, 4), 0.5)), axis=-1)))
+
+        box = Box([0, 0, 0], [1, 2, 3], (2, 3, 4))
+        self.assertTrue(allclose(box.array().T.reshape(2, 3, 4, 3)[1, 2, 3], [1, 2, 3]))
+
+        shell = SphericalShell([1, 0, 0], 2, (5, 8))
+        self.assertTrue(allclose(norm(shell.array().T - [1, 0, 0], axis=1), 2))
+
+        # The axis of a cylinder of orientation (0, pi/2) is the x axis
+        cylinder = CylinderSurface([0, 0, 0], [0, pi/2], 0.5, 2, (3, 8))
+        points = cylinder.array()
+        self.assertTrue(allclose(norm(points[1:], axis=0), 0.5))
+        self.assertTrue(allclose(points[0].reshape(3, 8), [[-1], [0], [1]]))
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        point_block = bs_solver.POINT_BLOCK
+        try:
+            bs_solver.POINT_BLOCK = 7
+            self.assertTrue(allclose(bs_solver.solve(wires, plane, cache=False),
+                                     bs_solver.solve(wires, plane.array(), cache=False), rtol=1e-12, atol=0))
+
+            # One pool of workers should solve every block
+            self.assertTrue(array_equal(bs_solver.solve(wires, plane, workers=2), bs_solver.solve(wires, plane)))
+        finally:
+            bs_solver.POINT_BLOCK = point_block
+
+    def test_solve_to_file(self):
+        # A volume written tile by tile should match solving it in memory, and an interrupted calculation should
+        # resume from its last completed tile
+        import json
+        from os.path import join
+        from tempfile import TemporaryDirectory
+        from numpy.lib.format import open_memmap
+        from bs_solver import solve, solve_to_file, load_field
+        from bs_points import Box
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = Box([-1, -1, 0.2], [1, 1, 0.8], (5, 4, 3))
+        b = solve(wires, points, cache=False).reshape(5, 4, 3, 3)
+
+        with TemporaryDirectory() as directory:
+            filename = join(directory, "field.npy")
+            self.assertTrue(allclose(solve_to_file(wires, points, filename, tile=16), b, rtol=1e-12, atol=0))
+
+            # Interrupt the calculation after its second tile: only the tiles after it are solved again
+            field = open_memmap(filename, mode="r+")
+            field.reshape(-1, 3)[:] = 0
+            field.flush()
+            del field
+            with open(filename + ".json") as f:
+                progress = json.load(f)
+            with open(filename + ".json", "w") as f:
+                json.dump(progress | {"done": 2}, f)
+
+            self.assertEqual(load_field(filename)[1]["done"], 2)
+            resumed = solve_to_file(wires, points, filename, tile=16).reshape(-1, 3)
+            self.assertTrue(all(resumed[:32] == 0))
+            self.assertTrue(allclose(resumed[32:], b.reshape(-1, 3)[32:], rtol=1e-12, atol=0))
+            self.assertEqual(load_field(filename)[1]["done"], 4)
+
+    def test_volume_slice(self):
+        # A volume written by the action should be stored in x-y slices, each read back as one contiguous block
+        from os.path import join
+        from tempfile import TemporaryDirectory
+        from numpy import meshgrid
+        from bs_actions import _calculate_magnetic_field, _read_slice_xy
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_circle_params())
+
+        with TemporaryDirectory() as directory:
+            filename = join(directory, "volume.npy")
+            action = {"lower": [-1, -0.5, 0], "upper": [1, 0.5, 0.6], "np": [5, 4, 3], "output": filename}
+            _calculate_magnetic_field(action, wires)
+
+            xs, ys, b = _read_slice_xy(filename, 0.35)
+            self.assertTrue(b.flags["C_CONTIGUOUS"])
+            self.assertTrue(allclose(xs, linspace(-1, 1, 5)) and allclose(ys, linspace(-0.5, 0.5, 4)))
+
+            xx, yy = meshgrid(xs, ys)
+            expected = solve(wires, array([xx.ravel(), yy.ravel(), full(20, 0.3)])).reshape(4, 5, 3)
+            self.assertTrue(allclose(b, expected, rtol=1e-12, atol=0))
+            del b
+
+    def test_field_table(self):
+        # A field table should reproduce the solved field at its grid points, interpolate between them to about its
+        # reported error, and solve points outside its grid directly
+        from os.path import join
+        from tempfile import TemporaryDirectory
+        from numpy.random import default_rng
+        from numpy.linalg import norm
+        from bs_solver import solve
+        from bs_table import FieldTable
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_circle_params() | {"radius": 1, "centre": array([0, 0, 0])})
+        points = default_rng(0).uniform(-0.4, 0.4, (3, 500))
+        b = solve(wires, points, cache=False)
+
+        for order, tolerance in ((1, 2e-2), (3, 2e-3)):
+            table = FieldTable(wires, [-0.4, -0.4, -0.4], [0.4, 0.4, 0.4], (9, 9, 9), order=order)
+            self.assertTrue(allclose(table.solve(table.grid.array()), table.b.reshape(-1, 3), rtol=1e-12, atol=0))
+            self.assertLess(norm(table.solve(points) - b, axis=1).max(), 3*table.error)
+            self.assertLess(table.error, tolerance*abs(b).max())
+
+        outside = array([[1, 0, 0.5], [0.2, 0.1, 0], [0.5, 0.6, 1]])
+        self.assertTrue(allclose(table.solve(outside), solve(wires, outside), rtol=1e-12, atol=0))
+
+        # A table written to a file is read back rather than solved again, and asking to cache fields is harmless
+        with TemporaryDirectory() as directory:
+            filename = join(directory, "table.npy")
+            table = FieldTable(wires, [-0.4, -0.4, -0.4], [0.4, 0.4, 0.4], (9, 9, 9), filename=filename)
+            self.assertTrue(allclose(FieldTable(wires, [-0.4, -0.4, -0.4], [0.4, 0.4, 0.4], (9, 9, 9),
+                                                filename=filename, cache=True).solve(points), table.solve(points)))
+
+    def test_adaptive_slice(self):
+        # An adaptive slice should solve every point it returns correctly, and gather its points near the wire
+        from numpy import meshgrid
+        from bs_actions import _adaptive_slice_xy
+        from bs_solver import solve, b_abs
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_circle_params())
+        x, y, b_mag = _adaptive_slice_xy(wires, [-1, 1], [-1, 1], 9, 3e-2, 4)
+
+        self.assertTrue(allclose(b_mag, b_abs(solve(wires, array([x, y, zeros(len(x))]))), rtol=1e-12, atol=0))
+        self.assertLess(len(x), 129**2 / 2)
+
+        # The loop crosses the slice at (0.5, -0.25) and (0.5, 0.25): every point of the finest lattice should be
+        # solved around there, and few far from them
+        xx, yy = meshgrid(linspace(-1, 1, 129), linspace(-1, 1, 129))
+        distance = sqrt((x - 0.5)**2 + (abs(y) - 0.25)**2)
+        lattice_distance = sqrt((xx - 0.5)**2 + (abs(yy) - 0.25)**2)
+        self.assertEqual((distance < 0.1).sum(), (lattice_distance < 0.1).sum())
+        self.assertLess((distance > 0.5).sum(), 0.2 * (lattice_distance > 0.5).sum())
+
+    def test_solve_patterns(self):
+        # Superposing cached basis fields should match solving each excitation pattern in full
+        from bs_solver import solve, solve_patterns
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = array([[0.1, -0.3, 0.5], [0.2, 0.4, -0.1], [0.3, 0.0, 1.0]])
+        patterns = array([[complex(1, 0), complex(2, 0.5), complex(0, 1)],
+                          [complex(1, 0.5), complex(0.5, 0), complex(3, 2)]])
+
+        b = solve_patterns(wires, points, patterns)
+        for k in range(3):
+            wires.wires[0].set_current(patterns[0, k])
+            wires.wires[1].set_current(patterns[1, k])
+            self.assertTrue(allclose(b[:, :, k], solve(wires, points), rtol=1e-12, atol=1e-20))
+
+    def test_real_field(self):
+        # Currents without a phase should give a real field, and a phase should give a complex one
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        points = array([[0.1, -0.3], [0.2, 0.4], [0.3, 0.0]])
+        self.assertEqual(solve(wires, points).dtype, float)
+
+        wires.wires[0].set_current(complex(1, 0.5))
+        self.assertEqual(solve(wires, points).dtype, complex)
+
+    def test_single_precision(self):
+        # Single precision should stay within its documented bound of the double precision field
+        from bs_solver import solve
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = array([linspace(-1, 1, 37), linspace(0, 2, 37), linspace(-0.5, 0.5, 37)])
+
+        b = solve(wires, points)
+        b_single = solve(wires, points, precision="single")
+        self.assertEqual(b_single.dtype, b.dtype)
+        self.assertTrue(abs(b_single - b).max() < 1e-6 * abs(b).max())
+
+        # The circular loop validation: radius 2, 100 points, along the axis from z = 0.1 to 10
+        loop = Wires()
+        loop.new_wire({"name": "loop", "shape": "circle", "centre": array([0, 0, 0]), "radius": 2, "np": 100,
+                       "n": 1, "orientation": array([0, 0]), "current": complex(1, 0)})
+        points = array([zeros(100), zeros(100), linspace(0.1, 10, 100)])
+
+        b = solve(loop, points)
+        b_single = solve(loop, points, precision="single")
+        self.assertTrue(abs(b_single - b).max() < 1e-6 * abs(b).max())
+
+    def test_field_cache(self):
+        # Repeating a solve should be answered from memory, or from disk in a later run, with the same field, and
+        # changing a current should solve again
+        import os
+        from tempfile import TemporaryDirectory
+        from bs_solver import solve, set_field_cache, clear_field_cache, field_cache_stats
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        wires.new_wire(_circle_params())
+        points = array([[0.1, -0.3, 0.5], [0.2, 0.4, -0.1], [0.3, 0.0, 1.0]])
+        b = solve(wires, points, cache=False)
+
+        with TemporaryDirectory() as directory:
+            try:
+                set_field_cache(directory)
+                clear_field_cache()
+                self.assertTrue(array_equal(solve(wires, points, cache=True), b))
+                cached = solve(wires, points, cache=True)
+                self.assertTrue(array_equal(cached, b))
+                self.assertEqual(field_cache_stats(), {"hits": 1, "misses": 1, "disk_hits": 0, "disk_misses": 1})
+
+                # The cached field must not be changed through the arrays it returns
+                cached[:] = 0
+                self.assertTrue(array_equal(solve(wires, points, cache=True), b))
+
+                # A new run starts with an empty memory, but finds the field on disk
+                clear_field_cache()
+                self.assertTrue(array_equal(solve(wires, points, cache=True), b))
+                self.assertEqual(field_cache_stats()["disk_hits"], 1)
+
+                wires.wires[0].set_current(complex(2, 0))
+                self.assertFalse(array_equal(solve(wires, points, cache=True), b))
+                self.assertEqual(field_cache_stats()["misses"], 2)
+
+                # Without asking for it, nothing is looked up or stored
+                solve(wires, points)
+                self.assertEqual(field_cache_stats()["misses"], 2)
+
+                # A field too large for the disk cache is not written to it
+                set_field_cache(directory, max_bytes=b.nbytes - 1)
+                solve(wires, points, cache=True, precision="single")
+                self.assertEqual(len(os.listdir(directory)), 2)
+            finally:
+                set_field_cache(None)
+                clear_field_cache()
+
+    def test_segment_table_cache(self):
+        # The compiled segment table should be reused until a wire changes
+        from bs_wires import Wires
+
+        wires = Wires()
+        wires.new_wire(_square_params())
+        self.assertTrue(wires.wires[0].coordinates.flags["C_CONTIGUOUS"])
+
+        table = wires.segment_table()
+        self.assertIs(wires.segment_table(), table)
+
+        wires.wires[0].set_loops(3)
+        self.assertIsNot(wires.segment_table(), table)
+        self.assertTrue(all(wires.segment_table()["current"] == 3))
+
+        wires.new_wire(_circle_params())
+        self.assertEqual(wires.segment_table()["index"].max(), 1)
+
+    def test_discretize_segments(self):
+        # Chunks should be no longer than dl and cover each segment exactly, including any remainder
+        from bs_discretizer import discretize_segments
+
+        starts = array([[0, 0, 0], [1, 0, 0], [0, 0, 0]])
+        ends = array([[1, 0, 0], [1, 0.35, 0], [0, 0, 0.2]])
+        chunk_starts, chunk_ends, offsets = discretize_segments(starts, ends, 0.1)
+
+        self.assertEqual(list(offsets), [0, 10, 14, 16])
+        self.assertTrue(allclose(chunk_starts[offsets[:-1]], starts))
+        self.assertTrue(allclose(chunk_ends[offsets[1:] - 1], ends))
+        self.assertTrue(allclose(chunk_starts[1:10], chunk_ends[:9]))
+        self.assertTrue(all(sqrt(((chunk_ends - chunk_starts)**2).sum(axis=1)) <= 0.1 + 1e-12))
+
+
+def _square_params():
+    """
+    Parameters for a square loop in the x-y plane, as returned by `parse_json`.
+    """
+    return {
+        "name": "square", "shape": "square", "centre": array([0, 0, 0]), "length": 2, "dl": 0.1, "n": 1,
+        "orientation": array([0, 0]), "current": complex(1, 0)
+    }
+
+
+def _circle_params():
+    """
+    Parameters for a circular loop in the y-z plane, as returned by `parse_json`.
+    """
+    return {
+        "name": "circle", "shape": "circle", "centre": array([0.5, 0, 0]), "radius": 0.25, "np": 100, "n": 2,
+        "orientation": array([0, pi/2]), "current": complex(1, 0.5)
+    }
+
 
 if __name__ == "__main__":
     # Add importing from modules in the directory above
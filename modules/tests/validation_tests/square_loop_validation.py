@@ -6,7 +6,7 @@ Circular loop
 # Internal Imports
 from import_above import allow_above_imports
 # External imports
-from numpy import array, linspace, sqrt, sum, floor, log10
+from numpy import array, linspace, sqrt, sum, floor, log10, pi
 from scipy.constants import mu_0 as mu
 import matplotlib.pyplot as plt
 from timeit import timeit  # noqa: F401
@@ -16,6 +16,53 @@ def round_sig(x, sig=2):
     return round(x, sig-int(floor(log10(abs(x))))-1)
 
 
+# Discretization lengths to try with each quadrature rule, and the RMSE the cheapest rule must meet
+DLS = [1, 0.5, 0.2, 0.1, 0.05]
+TOLERANCE = 1e-12
+
+
+def compare_quadrature(action, wires):
+    """
+    Report the error of each quadrature rule against the analytical solution, versus its cost in kernel
+    evaluations per point, and the cheapest rule and discretization length which meet `TOLERANCE`.
+    """
+    # Internal imports
+    from bs_solver import solve, b_abs, quadrature_rule, QUADRATURE_RULES
+
+    # Set up the points along the axis of the loop, as for the validation action
+    zs = linspace(action["start_point"][2], action["end_point"][2], action["np"])
+    points = array([linspace(action["start_point"][0], action["end_point"][0], action["np"]),
+                    linspace(action["start_point"][1], action["end_point"][1], action["np"]), zs])
+
+    wire = wires.wires[0]
+    current = wire.current
+    length = wire.length
+    r = sqrt(zs**2 + (length/2)**2)
+    b_analytical = abs((mu*current)/(2*pi*r**2) * (length**2)/(sqrt(zs**2 + (length**2)/2)))
+
+    original_dl = wire.dl
+    results = []
+    print(f"{'Rule':>10} {'dl':>6} {'Evaluations':>12} {'RMSE (T)':>12}")
+    for rule in QUADRATURE_RULES:
+        for dl in DLS:
+            wire.dl = dl
+            b_mag = b_abs(solve(wires, points, quadrature=rule))
+            rmse = sqrt(sum((b_analytical-b_mag)**2.0)/len(b_mag))
+
+            # Cost is the number of kernel evaluations for every point: each chunk is evaluated at every node
+            cost = len(wire.segments()[0]) * len(quadrature_rule(rule)[0])
+            results.append((cost, rule, dl, rmse))
+            print(f"{rule:>10} {dl:>6} {cost:>12} {rmse:>12.3e}")
+    wire.dl = original_dl
+
+    passing = [result for result in results if result[3] <= TOLERANCE]
+    if passing:
+        cost, rule, best_dl, rmse = min(passing)
+        print(f"Cheapest rule with RMSE <= {TOLERANCE}: {rule}, dl = {best_dl}, {cost} evaluations per point")
+    else:
+        print(f"No rule reached RMSE <= {TOLERANCE}")
+
+
 def main():
     """
     square_loop_validation.py
@@ -40,6 +87,9 @@ def main():
     for action in actions:
         do_action(action, wires)
 
+        if action["name"] == "validate magnetic field":
+            compare_quadrature(action, wires)
+
 
 if __name__ == "__main__":
     allow_above_imports()
@@ -0,0 +1,78 @@
+"""
+Benchmark script to compare the treecode kernel of the Biot-Savart solver against direct summation.
+
+A solenoid of densely wound turns is solved at as many random points inside and around it as it has elements,
+for growing numbers of turns, to find the crossover beyond which the treecode is faster.
+"""
+# Internal Imports
+from import_above import allow_above_imports
+# External imports
+from numpy import array, abs
+from numpy.random import default_rng
+from time import perf_counter
+
+# Points per turn, numbers of turns to benchmark, and the opening angle of the treecode
+NP = 100
+TURNS = [5, 10, 20, 50, 100, 200]
+THETA = 0.5
+
+
+def solenoid(turns):
+    """
+    Create a solenoid of `turns` circular turns of radius 0.5, wound along the z axis between z = -1 and 1.
+    """
+    from bs_wires import Wires
+
+    wires = Wires()
+    for i in range(turns):
+        wires.new_wire({
+            "name": f"turn{i}", "shape": "circle", "centre": array([0, 0, -1 + 2*i/max(1, turns - 1)]),
+            "radius": 0.5, "np": NP, "n": 1, "orientation": array([0, 0]), "current": complex(1, 0)
+        })
+
+    return wires
+
+
+def main():
+    """
+    treecode_benchmark.py
+
+    Time the `midpoint` and `treecode` kernels for each solenoid and report the error of the treecode.
+    """
+    # Internal imports
+    from bs_solver import solve
+
+    rng = default_rng(0)
+    crossover = None
+
+    print(f"{'Elements':>9} {'Points':>9} {'Direct (s)':>11} {'Treecode (s)':>13} {'Speedup':>8} {'Max error':>10}")
+    for turns in TURNS:
+        wires = solenoid(turns)
+        n_points = turns * NP
+        points = rng.uniform(-1.5, 1.5, (3, n_points))
+
+        start = perf_counter()
+        b_direct = solve(wires, points)
+        direct = perf_counter() - start
+
+        start = perf_counter()
+        b_tree = solve(wires, points, kernel="treecode", theta=THETA)
+        tree = perf_counter() - start
+
+        # Error relative to the peak field, so points on top of a wire don't dominate
+        error = abs(b_tree - b_direct).max() / abs(b_direct).max()
+        print(f"{n_points:>9} {n_points:>9} {direct:>11.3f} {tree:>13.3f} {direct/tree:>8.2f} {error:>10.2e}")
+
+        if crossover is None and tree < direct:
+            crossover = n_points
+
+    if crossover is None:
+        print("The treecode was not faster than direct summation at any size")
+    else:
+        print(f"The treecode is faster than direct summation from about {crossover} elements and points, "
+              f"with theta = {THETA}")
+
+
+if __name__ == "__main__":
+    allow_above_imports()
+    main()